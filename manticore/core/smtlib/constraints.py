@@ -43,6 +43,7 @@ class ConstraintSet:
         self._sid = 0
         self._declarations = {}
         self._child = None
+        self._version = 0
 
     def __reduce__(self):
         return (
@@ -98,6 +99,12 @@ class ConstraintSet:
                 return
 
         self._constraints.append(constraint)
+        self._version += 1
+
+    @property
+    def version(self) -> int:
+        """ Counter that changes every time a constraint is added to this set """
+        return self._version
 
     def _get_sid(self) -> int:
         """ Returns a unique id. """
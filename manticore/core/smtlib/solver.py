@@ -18,7 +18,7 @@ import threading
 import collections
 import shlex
 import time
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 from subprocess import PIPE, Popen
 import re
 from . import operators as Operators
@@ -39,6 +39,11 @@ consts.add(
     description="Maximum solutions to provide when solving for all values",
 )
 consts.add("z3_bin", default="z3", description="Z3 binary to use")
+consts.add(
+    "spare_procs",
+    default=0,
+    description="Number of z3 processes started in the background, ready to replace the current one on reset (off by default: every solver instance keeps its own spares and thread)",
+)
 consts.add("defaultunsat", default=True, description="Consider solver timeouts as unsat core")
 consts.add(
     "optimize", default=True, description="Use smtlib command optimize to find min/max if available"
@@ -47,6 +52,7 @@ consts.add(
 
 # Regular expressions used by the solver
 RE_GET_EXPR_VALUE_FMT = re.compile(r"\(\((?P<expr>(.*))\ #x(?P<value>([0-9a-fA-F]*))\)\)")
+RE_GET_BOOL_VALUES = re.compile(r"\((?P<expr>[^\s()]+) (?P<value>true|false)\)")
 RE_OBJECTIVES_EXPR_VALUE = re.compile(
     r"\(objectives.*\((?P<expr>.*) (?P<value>\d*)\).*\).*", re.MULTILINE | re.DOTALL
 )
@@ -58,11 +64,12 @@ class SingletonMixin(object):
 
     @classmethod
     def instance(cls):
-        tid = threading.get_ident()
-        pid = os.getpid()
-        if not (pid, tid) in cls.__singleton_instances:
-            cls.__singleton_instances[(pid, tid)] = cls()
-        return cls.__singleton_instances[(pid, tid)]
+        key = (os.getpid(), threading.get_ident())
+        try:
+            return cls.__singleton_instances[key]
+        except KeyError:
+            instance = cls.__singleton_instances[key] = cls()
+            return instance
 
 
 class SolverException(SmtlibError):
@@ -96,6 +103,10 @@ class Solver(SingletonMixin):
         """Check if given expression could be valid"""
         raise SolverException("Abstract method not implemented")
 
+    def can_be_true_many(self, constraints, expressions) -> List[bool]:
+        """Check, for each of the given expressions, if it could be valid on its own"""
+        return [self.can_be_true(constraints, expression) for expression in expressions]
+
     def must_be_true(self, constraints, expression) -> bool:
         """Check if expression is True and that it can not be False with current constraints"""
         solutions = self.get_all_values(constraints, expression, maxcnt=2, silent=True)
@@ -151,6 +162,11 @@ class Z3Solver(Solver):
         """
         super().__init__()
         self._proc: Popen = None
+        # Already initialized z3 processes, ready to take over on reset (see `spare_procs`)
+        self._spares: collections.deque = collections.deque()
+        self._spawner: Optional[threading.Thread] = None
+        # Forked workers inherit the spares, which belong to this process only
+        self._spares_pid = os.getpid()
 
         self._command = (
             f"{consts.z3_bin} -t:{consts.timeout*1000} -memory:{consts.memory} -smt2 -in"
@@ -174,6 +190,8 @@ class Z3Solver(Solver):
         self._get_value_fmt = (RE_GET_EXPR_VALUE_FMT, 16)
 
         self.debug = False
+        # Constraint set, version and declared names currently loaded for can_be_true_many
+        self._probing = None
         # To cache what get-info returned; can be directly set when writing tests
         self._received_version = None
         self.version = self._solver_version()
@@ -214,11 +232,10 @@ class Z3Solver(Solver):
             parsed_version = Version(float("inf"), float("inf"), float("inf"))
         return parsed_version
 
-    def _start_proc(self):
-        """Spawns z3 solver process"""
-        assert "_proc" not in dir(self) or self._proc is None
+    def _spawn_proc(self) -> Popen:
+        """Spawns and initializes a z3 solver process"""
         try:
-            self._proc = Popen(
+            proc = Popen(
                 shlex.split(self._command),
                 stdin=PIPE,
                 stdout=PIPE,
@@ -233,7 +250,40 @@ class Z3Solver(Solver):
 
         # run solver specific initializations
         for cfg in self._init:
-            self._send(cfg)
+            proc.stdin.write(f"{cfg}\n")
+        return proc
+
+    def _spawn_spares(self):
+        """Spawns and warms up z3 solver processes until there are `consts.spare_procs` spares"""
+        try:
+            while len(self._spares) < consts.spare_procs:
+                proc = self._spawn_proc()
+                # z3 sets itself up lazily on the first query; pay for it here
+                proc.stdin.write("(check-sat)\n")
+                proc.stdout.readline()
+                self._spares.append(proc)
+        except Z3NotFoundError:
+            logger.debug("Could not spawn a spare z3 process")
+
+    def _start_proc(self):
+        """
+        Takes over a spare z3 solver process, or spawns one if there are none left.
+        Spares are then replenished in the background, so that the next reset
+        does not have to wait for a new process to start.
+        """
+        assert "_proc" not in dir(self) or self._proc is None
+        try:
+            self._proc = self._spares.popleft()
+        except IndexError:
+            self._proc = self._spawn_proc()
+
+        if (
+            consts.spare_procs > 0
+            and len(self._spares) < consts.spare_procs
+            and (self._spawner is None or not self._spawner.is_alive())
+        ):
+            self._spawner = threading.Thread(target=self._spawn_spares, daemon=True)
+            self._spawner.start()
 
     def _stop_proc(self):
         """
@@ -276,6 +326,13 @@ class Z3Solver(Solver):
         try:
             if self._proc is not None:
                 self._stop_proc()
+            if self._spares_pid != os.getpid():
+                return
+            if self._spawner is not None:
+                self._spawner.join()
+            while self._spares:
+                self._proc = self._spares.popleft()
+                self._stop_proc()
             # self._proc.stdin.writelines(('(exit)\n',))
             # self._proc.wait()
         except Exception as e:
@@ -283,6 +340,7 @@ class Z3Solver(Solver):
 
     def _reset(self, constraints: Optional[str] = None) -> None:
         """Auxiliary method to reset the smtlib external solver to initial defaults"""
+        self._probing = None
         if self._proc is None:
             self._start_proc()
         else:
@@ -345,15 +403,19 @@ class Z3Solver(Solver):
         return buf, buf.count("("), buf.count(")")
 
     # UTILS: check-sat get-value
-    def _is_sat(self) -> bool:
+    def _is_sat(self, assumptions: Optional[List[str]] = None) -> bool:
         """
         Check the satisfiability of the current state
 
+        :param assumptions: names of boolean literals to assume true for this check only
         :return: whether current state is satisfiable or not.
         """
         logger.debug("Solver.check() ")
         start = time.time()
-        self._send("(check-sat)")
+        if assumptions:
+            self._send(f"(check-sat-assuming ({' '.join(assumptions)}))")
+        else:
+            self._send("(check-sat)")
         status = self._recv()
         logger.debug("Check took %s seconds (%s)", time.time() - start, status)
         if status not in ("sat", "unsat", "unknown"):
@@ -372,6 +434,25 @@ class Z3Solver(Solver):
             check_disk_usage()
         return is_sat
 
+    def _get_unsat_core(self) -> List[str]:
+        """
+        Names of the assumed literals responsible for the last unsat check.
+
+        Requires :produce-unsat-cores to have been enabled before any assertion.
+        """
+        self._send("(get-unsat-core)")
+        core = self._recv()
+        assert core.startswith("(") and core.endswith(")"), core
+        return core[1:-1].split()
+
+    def _get_bool_values(self, names: List[str]) -> Dict[str, bool]:
+        """
+        Values of the given boolean literals in the model of the last sat check,
+        fetched with a single query.
+        """
+        self._send(f"(get-value ({' '.join(names)}))")
+        return {name: value == "true" for name, value in RE_GET_BOOL_VALUES.findall(self._recv())}
+
     def _assert(self, expression: Bool):
         """Auxiliary method to send an assert"""
         assert isinstance(expression, Bool)
@@ -437,6 +518,83 @@ class Z3Solver(Solver):
             self._reset(temp_cs.to_string(related_to=expression))
             return self._is_sat()
 
+    def can_be_true_many(self, constraints: ConstraintSet, expressions: List[Bool]) -> List[bool]:
+        """
+        Check, for each of the given expressions, if it could be valid on its own.
+
+        Every expression is bound to a fresh tracking literal and all of them are
+        decided in a single solver session. A single check assuming all literals
+        settles the common case where every expression is feasible at once;
+        otherwise the literals of the unsat core are checked one by one (a core
+        made of a single literal already proves it infeasible) and the
+        remaining ones are checked together again. The model of every literal
+        found feasible on its own also settles any other pending literal it
+        happens to satisfy.
+
+        The constraints stay loaded in the solver after the call and each batch
+        of expressions lives in its own push/pop scope, so consecutive calls
+        with an unchanged constraint set skip resending them. Working
+        incrementally also keeps z3 away from its (costly) preprocessing
+        tactics, which pay off for a single big query but not for many small ones.
+        """
+        probing, self._probing = self._probing, None
+        if probing is None or probing[0] is not constraints or probing[1] != constraints.version:
+            self._reset()
+            self._send("(set-option :produce-unsat-cores true)")
+            self._send(constraints.to_string())
+            declared = {var.name for var in constraints.declarations}
+            probing = (constraints, constraints.version, declared)
+        declared = set(probing[2])
+
+        result = [False] * len(expressions)
+        with constraints as temp_cs:
+            self._push()
+            literals = {}
+            for index, expression in enumerate(expressions):
+                literal = temp_cs.new_bool(name="track", avoid_collisions=True)
+                for var in get_variables(expression) | {literal}:
+                    if var.name not in declared:
+                        self._send(var.declaration)
+                        declared.add(var.name)
+                self._assert(literal == expression)
+                literals[literal.name] = index
+
+            pending = list(literals)
+            while pending:
+                if self._is_sat(pending):
+                    for name in pending:
+                        result[literals[name]] = True
+                    break
+                try:
+                    core = self._get_unsat_core()
+                except SolverException:
+                    # No core available (e.g. an unknown was taken as unsat)
+                    core = list(pending)
+                if not core:
+                    # The constraints alone are unsat
+                    break
+                if len(core) == 1:
+                    # Proven infeasible on its own by the check that produced the core
+                    result[literals[core[0]]] = False
+                    pending.remove(core[0])
+                    continue
+                for name in core:
+                    if name not in pending:
+                        # Already settled by an earlier model
+                        continue
+                    pending.remove(name)
+                    result[literals[name]] = self._is_sat([name])
+                    if result[literals[name]] and pending:
+                        # The model found may well satisfy other pending literals
+                        values = self._get_bool_values(pending)
+                        for other in [other for other in pending if values.get(other)]:
+                            result[literals[other]] = True
+                            pending.remove(other)
+            self._pop()
+
+        self._probing = probing
+        return result
+
     # get-all-values min max minmax
     def get_all_values(self, constraints, expression, maxcnt=None, silent=False):
         """Returns a list with all the possible values for the symbol x"""
@@ -773,6 +773,28 @@ class Cpu(Eventful):
             result.append(Operators.CHR(self.read_int(where + i, 8, force)))
         return result
 
+    def read_buffer(self, where: int, size: int, force: bool = False):
+        """
+        Read from memory with a single memory access, rather than one byte at a
+        time like :meth:`read_bytes`. A single pair of `will_read_memory` and
+        `did_read_memory` events covers the whole buffer; the latter carries the
+        list of bytes read.
+
+        :param where: address to read data from
+        :param size: number of bytes
+        :param force: whether to ignore memory permissions
+        :return: data
+        :rtype: list[int or Expression]
+        """
+        if size == 0:
+            return []
+        self._publish("will_read_memory", where, 8 * size)
+
+        data = [Operators.ORD(b) for b in self._memory.read(where, size, force)]
+
+        self._publish("did_read_memory", where, data, 8 * size)
+        return data
+
     def write_string(
         self, where: int, string: str, max_length: Optional[int] = None, force: bool = False
     ) -> None:
@@ -19,7 +19,7 @@ from ..utils import config
 import functools
 import logging
 
-from typing import Dict, Generator, Iterable, List, MutableMapping, Optional, Set
+from typing import Dict, Generator, Iterable, List, MutableMapping, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -293,6 +293,22 @@ class AnonMap(Map):
     def __reduce__(self):
         return (self.__class__, (self.start, len(self), self.perms, self._data, self.name))
 
+    def concrete_run(self, address: int) -> Tuple[int, bool]:
+        """
+        Finds the concrete non-zero bytes from `address` up to the next 0 with a single
+        search of the buffer. Once the map holds symbolic data no bytes are reported.
+
+        :param address: the address to start from.
+        :return: the number of bytes found, and whether they are followed by a 0.
+        """
+        if not isinstance(self._data, bytearray):
+            return 0, False
+        offset = self._get_offset(address)
+        zero = self._data.find(0, offset)
+        if zero == -1:
+            return len(self._data) - offset, False
+        return zero - offset, True
+
     def split(self, address):
         if address <= self.start:
             return None, self
@@ -960,6 +976,22 @@ class Memory(object, metaclass=ABCMeta):
         else:
             return self.map_containing(index).perms
 
+    def concrete_run(self, addr: int) -> Tuple[int, bool]:
+        """
+        Finds the concrete non-zero bytes from `addr` up to the next 0, within the map
+        holding `addr`. Only readable anonymous maps are searched, at C speed; any other
+        memory reports no bytes.
+
+        :param addr: the address to start from.
+        :return: the number of bytes found, and whether they are followed by a concrete 0.
+        """
+        if addr not in self:
+            return 0, False
+        m = self.map_containing(addr)
+        if not isinstance(m, AnonMap) or not m.access_ok("r"):
+            return 0, False
+        return m.concrete_run(addr)
+
     def max_exec_size(self, addr, max_size):
         """
         Finds maximum executable memory size
@@ -1168,6 +1200,31 @@ class SMemory(Memory):
                 del self._symbols[addr]
         super().munmap(start, size)
 
+    def _first_symbolic(self, start: int, stop: int) -> Optional[int]:
+        """
+        :return: the first address in [start, stop) holding a symbolic byte, if any.
+        """
+        if not self._symbols:
+            return None
+        if len(self._symbols) < stop - start:
+            symbolic = [addr for addr in self._symbols if start <= addr < stop]
+            return min(symbolic) if symbolic else None
+        for addr in range(start, stop):
+            if addr in self._symbols:
+                return addr
+        return None
+
+    def concrete_run(self, addr: int) -> Tuple[int, bool]:
+        """
+        Symbolic bytes are kept apart from the concrete buffers and take precedence
+        over them, including over a 0 lying under one: runs stop at the first of them.
+        """
+        run, zero = super().concrete_run(addr)
+        symbolic = self._first_symbolic(addr, addr + run + int(zero))
+        if symbolic is not None:
+            return symbolic - addr, False
+        return run, zero
+
     def read(self, address, size, force=False):
         """
         Read a stream of potentially symbolic bytes from a potentially symbolic
@@ -1423,6 +1480,13 @@ class LazySMemory(SMemory):
 
         return addr
 
+    def _first_symbolic(self, start: int, stop: int) -> Optional[int]:
+        # Bytes backed by the symbolic store are read from it rather than from the maps
+        first = super()._first_symbolic(start, stop)
+        stop = stop if first is None else first
+        backed = [addr for addr in self.backed_by_symbolic_store if start <= addr < stop]
+        return min(backed) if backed else first
+
     def _deref_can_succeed(self, mapping, address, size):
         if not issymbolic(address):
             return address >= mapping.start and address + size < mapping.end
@@ -1,14 +1,25 @@
 """
 Models here are intended to be passed to :meth:`~manticore.native.state.State.invoke_model`, not invoked directly.
+
+The string models read memory in bulk with :meth:`~manticore.native.cpu.abstractcpu.Cpu.read_buffer`,
+which publishes one pair of memory read events per buffer rather than one per byte. Runs of concrete
+bytes skipped with :meth:`~manticore.native.memory.Memory.concrete_run` publish no event.
 """
 
 from .cpu.abstractcpu import ConcretizeArgument
+from .memory import MemoryException
 from ..core.smtlib import issymbolic
 from ..core.smtlib.solver import Z3Solver
-from ..core.smtlib.operators import ITEBV, ZEXTEND
+from ..core.smtlib.operators import ITEBV, OR, ZEXTEND
+from ..utils.helpers import CacheDict
 
 VARIADIC_FUNC_ATTR = "_variadic"
 
+# Number of bytes read and checked at once when looking for a NULL byte
+_FIND_ZERO_WINDOW = 16
+# Maximum number of `_find_zeros` results remembered per state
+_FIND_ZERO_CACHE_SIZE = 1024
+
 
 def isvariadic(model):
     """
@@ -31,49 +42,252 @@ def variadic(func):
     return func
 
 
-def _find_zero(cpu, constrs, ptr):
+def _can_be(solver, constrs, symbolic_bytes, zero, answers):
+    """
+    Helper for checking, for each of the given symbolic bytes, if it can be zero
+    or if it can be non-zero.
+
+    Answers are memoized in `answers` by byte `Expression`, so a byte that shows up
+    again (e.g. the same symbolic cell reached through both strcmp arguments)
+    is only sent to the solver once. `constrs` must stay the same for all the
+    lookups sharing `answers`.
+
+    :param Z3Solver solver:
+    :param ConstraintSet constrs: Constraints for current `State`
+    :param list symbolic_bytes: 8-bit `Expression`s to check
+    :param bool zero: Whether to check if the bytes can be zero or if they can be non-zero
+    :param dict answers: Known answers, `{byte: [can be non-zero, can be zero]}`
+    :return: One answer per byte
+    :rtype: list[bool]
+    """
+    side = 1 if zero else 0
+    # Expressions hash by identity: a dict (unlike a list) never compares them with ==
+    unknown = {}
+    for byt in symbolic_bytes:
+        if answers.setdefault(byt, [None, None])[side] is None:
+            unknown[byt] = None
+
+    if unknown:
+        preds = [byt == 0 if zero else byt != 0 for byt in unknown]
+        for byt, feasible in zip(unknown, solver.can_be_true_many(constrs, preds)):
+            answers[byt][side] = feasible
+
+    return [answers[byt][side] for byt in symbolic_bytes]
+
+
+def _find_zeros(cpu, constrs, ptr, first_only=False, answers=None, max_offset=None):
     """
-    Helper for finding the closest NULL or, effectively NULL byte from a starting address.
+    Helper for finding the bytes that are or can be NULL from a starting address,
+    up to the closest NULL or, effectively NULL byte.
+
+    The scan can be bounded with `max_offset`, for callers to which nothing past
+    it matters. Otherwise it only ends at a NULL byte, which is never found in
+    unconstrained symbolic memory before the scan runs off its mapping.
+
+    Runs of concrete bytes are skipped with `Memory.concrete_run`. The rest of the
+    memory is scanned in windows of `_FIND_ZERO_WINDOW` bytes. Each side of the
+    symbolic bytes of a window is settled with a single solver call: one finds
+    out which bytes can be non-zero, the other which bytes can be zero.
 
     :param Cpu cpu:
     :param ConstraintSet constrs: Constraints for current `State`
     :param int ptr: Address to start searching for a zero from
-    :return: Offset from `ptr` to first byte that is 0 or an `Expression` that must be zero
+    :param bool first_only: Only look for the closest byte that must be zero
+    :param dict answers: Solver answers to share with other calls under the same constraints
+    :param int max_offset: Offset from `ptr` to stop the scan at
+    :return: Offsets from `ptr` to every byte that can be zero (unless `first_only`), the
+        last one being the first byte that is 0 or an `Expression` that must be zero, or
+        `max_offset` if there is none before it
+    :rtype: list[int]
     """
 
+    solver = Z3Solver.instance()
+    if answers is None:
+        answers = {}
+    zeros = []
     offset = 0
-    while True:
-        byt = cpu.read_int(ptr + offset, 8)
-
-        if issymbolic(byt):
-            if not Z3Solver.instance().can_be_true(constrs, byt != 0):
-                break
-        else:
-            if byt == 0:
+    while max_offset is None or offset < max_offset:
+        run, concrete_zero = cpu.memory.concrete_run(ptr + offset)
+        offset += run
+        if max_offset is not None and offset >= max_offset:
+            break
+        if concrete_zero:
+            zeros.append(offset)
+            return zeros
+
+        start = ptr + offset
+        size = _FIND_ZERO_WINDOW
+        if start in cpu.memory:
+            # Never read ahead past the end of the current mapping
+            size = min(size, cpu.memory.map_containing(start).end - start)
+        if max_offset is not None:
+            size = min(size, max_offset - offset)
+
+        symbolic = []
+        concrete_zero = False
+        for i, byt in enumerate(cpu.read_buffer(start, size)):
+            if issymbolic(byt):
+                symbolic.append((i, byt))
+            elif byt == 0:
+                size = i
+                concrete_zero = True
                 break
 
-        offset += 1
+        must_be_zero = None
+        if symbolic:
+            can_be_nonzero = _can_be(solver, constrs, [byt for _, byt in symbolic], False, answers)
+            for index, feasible in enumerate(can_be_nonzero):
+                if not feasible:
+                    must_be_zero = symbolic[index][0]
+                    symbolic = symbolic[:index]
+                    break
+
+        if symbolic and not first_only:
+            can_be_zero = _can_be(solver, constrs, [byt for _, byt in symbolic], True, answers)
+            zeros.extend(offset + i for (i, _), feasible in zip(symbolic, can_be_zero) if feasible)
+
+        if must_be_zero is not None:
+            zeros.append(offset + must_be_zero)
+            return zeros
+
+        offset += size
+        if concrete_zero:
+            zeros.append(offset)
+            return zeros
+
+    zeros.append(max_offset)
+    return zeros
+
+
+def _same_bytes(a, b):
+    """
+    :return: Whether two lists returned by `Cpu.read_buffer` hold the very same bytes
+    :rtype: bool
+    """
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x is y:
+            continue
+        if issymbolic(x) or issymbolic(y) or x != y:
+            return False
+    return True
+
+
+def _cached_find_zeros(state, ptr, first_only=False, answers=None, max_offset=None):
+    """
+    Memoized `_find_zeros` for the current `State`.
+
+    A result is reused as long as no constraint was added to the state and the
+    bytes up to the NULL found are still the ones in memory, which costs a bulk
+    read instead of a new round of solver queries. The last offset of any
+    result answers a `first_only` lookup as well, and a result that goes past
+    `max_offset` answers a bounded lookup.
+
+    The bytes read are returned along with the offsets, so callers do not have
+    to read the string once more.
+
+    :param State state: Current program state
+    :param int ptr: Address to start searching for a zero from
+    :param bool first_only: Only look for the closest byte that must be zero
+    :param dict answers: Solver answers to share with other calls under the same constraints
+    :param int max_offset: Offset from `ptr` to stop the scan at
+    :return: Offsets from `ptr` to every byte that can be zero (unless `first_only`), the
+        last one being the first byte that is 0 or an `Expression` that must be zero (or
+        `max_offset` if there is none before it), and the bytes from `ptr` up to and
+        including that last one, as read by `Cpu.read_buffer`
+    :rtype: tuple[list[int], list]
+    """
+    cpu = state.cpu
+    constrs = state.constraints
+
+    strzero_cache = getattr(state, "_strzero_cache", None)
+    if strzero_cache is None:
+        strzero_cache = state._strzero_cache = CacheDict(max_size=_FIND_ZERO_CACHE_SIZE)
+
+    entry = strzero_cache.get(ptr)
+    if entry is not None:
+        cached_constrs, version, snapshot, zeros, complete, bound = entry
+        # A result cut short by its bound only says that there is no NULL before it
+        usable = (
+            bound is None or zeros[-1] < bound or (max_offset is not None and max_offset <= bound)
+        )
+        if (
+            usable
+            and (complete or first_only)
+            and cached_constrs is constrs
+            and version == constrs.version
+        ):
+            try:
+                current = cpu.read_buffer(ptr, len(snapshot))
+            except MemoryException:
+                current = None
+            if current is not None and _same_bytes(snapshot, current):
+                if first_only:
+                    zeros = zeros[-1:]
+                if max_offset is not None and zeros[-1] > max_offset:
+                    zeros = [zero for zero in zeros[:-1] if zero < max_offset] + [max_offset]
+                    current = current[: max_offset + 1]
+                return zeros, current
+
+    zeros = _find_zeros(cpu, constrs, ptr, first_only, answers, max_offset)
+    snapshot = cpu.read_buffer(ptr, zeros[-1] + 1)
+    strzero_cache[ptr] = (constrs, constrs.version, snapshot, zeros, not first_only, max_offset)
+    return zeros, snapshot
+
+
+def _first_difference(a, b):
+    """
+    Helper for finding the first index where two `bytes` of the same length
+    differ, comparing them as whole integers rather than byte by byte.
+
+    :param bytes a:
+    :param bytes b:
+    :return: Index of the first differing byte, or None if `a` and `b` are equal
+    :rtype: int or None
+    """
+    diff = int.from_bytes(a, "big") ^ int.from_bytes(b, "big")
+    if diff == 0:
+        return None
+    return len(a) - 1 - (diff.bit_length() - 1) // 8
 
-    return offset
+
+def _ite_tree(size, pairs):
+    """
+    Helper for building a balanced tree of ITEs out of `(condition, value)` pairs
+    where the first pair whose condition holds wins. A chain of nested ITEs
+    gives the same result, but its depth grows linearly with the number of
+    pairs instead of logarithmically.
+
+    :param int size: Bit size of the values
+    :param list pairs: Non-empty list of `(condition, value)` pairs, by priority
+    :return: A condition that holds if any of the pairs' does, and the value of
+        the first pair whose condition holds
+    :rtype: tuple
+    """
+    if len(pairs) == 1:
+        return pairs[0]
+    middle = len(pairs) // 2
+    left_cond, left_value = _ite_tree(size, pairs[:middle])
+    right_cond, right_value = _ite_tree(size, pairs[middle:])
+    return OR(left_cond, right_cond), ITEBV(size, left_cond, left_value, right_value)
 
 
 def strcmp(state, s1, s2):
     """
     strcmp symbolic model.
 
-    Algorithm: Walks from end of string (minimum offset to NULL in either string)
-    to beginning building tree of ITEs each time either of the
-    bytes at current offset is symbolic.
+    Algorithm: Finds the first offset where the result is known to be decided:
+    either the minimum offset to NULL in either string or the first pair of
+    concrete bytes that differ. The result at that offset is the default, and
+    every earlier offset where either byte is symbolic overrides it when its
+    bytes differ. These overrides are folded into a balanced tree of ITEs.
 
     Points of Interest:
-    - We've been building up a symbolic tree but then encounter two
-    concrete bytes that differ. We can throw away the entire symbolic
-    tree!
-    - If we've been encountering concrete bytes that match
-    at the end of the string as we walk forward, and then we encounter
-    a pair where one is symbolic, we can forget about that 0 `ret` we've
-    been tracking and just replace it with the symbolic subtraction of
-    the two
+    - Nothing past the first pair of concrete bytes that differ matters. If
+    no byte up to it is symbolic, there is no tree to build at all.
+    - If the default is 0, the last symbolic pair does not need an ITE: its
+    subtraction is 0 when its bytes match, just like the default.
 
     :param State state: Current program state
     :param int s1: Address of string 1
@@ -89,26 +303,67 @@ def strcmp(state, s1, s2):
     if issymbolic(s2):
         raise ConcretizeArgument(state.cpu, 2)
 
-    s1_zero_idx = _find_zero(cpu, state.constraints, s1)
-    s2_zero_idx = _find_zero(cpu, state.constraints, s2)
-    min_zero_idx = min(s1_zero_idx, s2_zero_idx)
+    answers = {}
+    s1_zeros, s1_bytes = _cached_find_zeros(state, s1, first_only=True, answers=answers)
+    # Nothing in s2 past the NULL of s1 can change the result
+    s2_zeros, s2_bytes = _cached_find_zeros(
+        state, s2, first_only=True, answers=answers, max_offset=s1_zeros[-1]
+    )
+    min_zero_idx = min(s1_zeros[-1], s2_zeros[-1])
+
+    s1_bytes = s1_bytes[: min_zero_idx + 1]
+    s2_bytes = s2_bytes[: min_zero_idx + 1]
+
+    try:
+        s1_prefix, s2_prefix = bytes(s1_bytes), bytes(s2_bytes)
+    except TypeError:
+        # At least one of the bytes is symbolic
+        pass
+    else:
+        first_difference = _first_difference(s1_prefix, s2_prefix)
+        end = min_zero_idx if first_difference is None else first_difference
+        return s1_prefix[end] - s2_prefix[end]
+
+    # Compare the heads of both strings, up to their first symbolic byte, at once
+    head = min(cpu.memory.concrete_run(s1)[0], cpu.memory.concrete_run(s2)[0], min_zero_idx)
+    first_difference = _first_difference(bytes(s1_bytes[:head]), bytes(s2_bytes[:head]))
+    if first_difference is not None:
+        return s1_bytes[first_difference] - s2_bytes[first_difference]
+
+    # Nothing past the first pair of concrete bytes that differ can change the result
+    end = min_zero_idx
+    all_concrete = True
+    for offset in range(head, min_zero_idx + 1):
+        s1char, s2char = s1_bytes[offset], s2_bytes[offset]
+        if issymbolic(s1char) or issymbolic(s2char):
+            all_concrete = False
+        elif s1char != s2char:
+            end = offset
+            break
+
+    if all_concrete:
+        return s1_bytes[end] - s2_bytes[end]
 
-    ret = None
+    abs_ = cpu.address_bit_size
 
-    for offset in range(min_zero_idx, -1, -1):
-        s1char = ZEXTEND(cpu.read_int(s1 + offset, 8), cpu.address_bit_size)
-        s2char = ZEXTEND(cpu.read_int(s2 + offset, 8), cpu.address_bit_size)
+    def zext(byte):
+        # Concrete bytes already fit in any width, only symbolic ones need extending
+        return ZEXTEND(byte, abs_) if issymbolic(byte) else byte
 
+    pairs = []
+    for offset in range(head, end):
+        s1char, s2char = s1_bytes[offset], s2_bytes[offset]
         if issymbolic(s1char) or issymbolic(s2char):
-            if ret is None or (not issymbolic(ret) and ret == 0):
-                ret = s1char - s2char
-            else:
-                ret = ITEBV(cpu.address_bit_size, s1char != s2char, s1char - s2char, ret)
-        else:
-            if s1char != s2char:
-                ret = s1char - s2char
-            elif ret is None:
-                ret = 0
+            s1char, s2char = zext(s1char), zext(s2char)
+            pairs.append((s1char != s2char, s1char - s2char))
+
+    ret = zext(s1_bytes[end]) - zext(s2_bytes[end])
+    if pairs and not issymbolic(ret) and ret == 0:
+        ret = pairs.pop()[1]
+
+    if pairs:
+        cond, value = _ite_tree(abs_, pairs)
+        ret = ITEBV(abs_, cond, value, ret)
 
     return ret
 
@@ -117,7 +372,7 @@ def strlen(state, s):
     """
     strlen symbolic model.
 
-    Algorithm: Walks from end of string not including NULL building ITE tree when current byte is symbolic.
+    Algorithm: Walks from end of string not including NULL building ITE tree when current byte can be NULL.
 
     :param State state: current program state
     :param int s: Address of string
@@ -130,13 +385,34 @@ def strlen(state, s):
     if issymbolic(s):
         raise ConcretizeArgument(state.cpu, 1)
 
-    zero_idx = _find_zero(cpu, state.constraints, s)
+    # A fully concrete string needs no solver, cache or read at all
+    length, concrete_zero = cpu.memory.concrete_run(s)
+    if concrete_zero:
+        return length
+
+    zeros, s_bytes = _cached_find_zeros(state, s)
+    zero_idx = zeros[-1]
+    if len(zeros) == 1:
+        return zero_idx
+
+    # The tree only depends on the bytes that can be NULL: when they are the very
+    # same ones as last time, hand out the same expression so that it is shared
+    # rather than duplicated wherever the results end up
+    leaves = [s_bytes[offset] for offset in zeros[:-1]]
+    strlen_cache = getattr(state, "_strlen_cache", None)
+    if strlen_cache is None:
+        strlen_cache = state._strlen_cache = CacheDict(max_size=_FIND_ZERO_CACHE_SIZE)
+    entry = strlen_cache.get(s)
+    if entry is not None:
+        cached_zeros, cached_leaves, ret = entry
+        if cached_zeros == zeros and _same_bytes(cached_leaves, leaves):
+            return ret
 
     ret = zero_idx
 
-    for offset in range(zero_idx - 1, -1, -1):
-        byt = cpu.read_int(s + offset, 8)
-        if issymbolic(byt):
-            ret = ITEBV(cpu.address_bit_size, byt == 0, offset, ret)
+    # Only the bytes that can be NULL need an ITE
+    for offset, byt in zip(reversed(zeros[:-1]), reversed(leaves)):
+        ret = ITEBV(cpu.address_bit_size, byt == 0, offset, ret)
 
+    strlen_cache[s] = (zeros, leaves, ret)
     return ret
@@ -42,6 +42,20 @@ class LazyMemoryTest(unittest.TestCase):
         with self.assertRaises(InvalidMemoryAccess):
             mem.read(8096, 4)
 
+    def test_concrete_run(self):
+        cs = ConstraintSet()
+        mem = LazySMemory32(cs)
+        mem.mmap(0, 4096, "rwx", name="map")
+        mem.write(0, b"abcd\0")
+        self.assertEqual(mem.concrete_run(0), (4, True))
+
+        # Bytes reachable by a symbolic write are read from the symbolic store
+        addr = cs.new_bitvec(32)
+        cs.add(addr >= 2)
+        cs.add(addr <= 3)
+        mem.write(addr, b"\0")
+        self.assertEqual(mem.concrete_run(0), (2, False))
+
     def test_sym_read_mapped(self):
         cs = ConstraintSet()
         mem = LazySMemory32(cs)
@@ -1260,6 +1260,30 @@ class MemoryTest(unittest.TestCase):
         self.assertIn(Operators.ORD("B"), values)
         self.assertIn(Operators.ORD("C"), values)
 
+    def test_concrete_run(self):
+        cs = ConstraintSet()
+        mem = SMemory32(cs)
+        addr = mem.mmap(None, 0x1000, "rw")
+        mem.write(addr, b"abc\0de")
+
+        self.assertEqual(mem.concrete_run(addr), (3, True))
+        self.assertEqual(mem.concrete_run(addr + 3), (0, True))
+        # No 0 up to the end of the map
+        mem.write(addr + 0x1000 - 2, b"fg")
+        self.assertEqual(mem.concrete_run(addr + 0x1000 - 2), (2, False))
+        self.assertEqual(mem.concrete_run(addr + 0x1000), (0, False))
+
+        # Symbolic bytes end runs, including over a concrete 0
+        mem.write(addr + 1, [cs.new_bitvec(8)])
+        self.assertEqual(mem.concrete_run(addr), (1, False))
+        mem.write(addr + 1, b"b")
+        mem.write(addr + 3, [cs.new_bitvec(8)])
+        self.assertEqual(mem.concrete_run(addr), (3, False))
+
+        # Unreadable memory
+        mem.mprotect(addr, 0x1000, "w")
+        self.assertEqual(mem.concrete_run(addr), (0, False))
+
     def testBasicSymbolic(self):
         cs = ConstraintSet()
         mem = SMemory32(cs)
@@ -1,5 +1,6 @@
 import unittest
 import os
+from unittest import mock
 
 from manticore.core.smtlib import ConstraintSet, Z3Solver
 from manticore.native.state import State
@@ -80,6 +81,103 @@ class StrcmpTest(ModelTest):
         _concrete_gt("c\0", "b\0")
         _concrete_gt("bc\0", "b\0")
 
+    def test_concrete_first_difference(self):
+        strs = self._push2("ab\0", "ba\0")
+        self.assertTrue(strcmp(self.state, *strs) < 0)
+        strs = self._push2("ba\0", "ab\0")
+        self.assertTrue(strcmp(self.state, *strs) > 0)
+        strs = self._push2("x" * 100 + "ab\0", "x" * 100 + "ac\0")
+        self.assertEqual(strcmp(self.state, *strs), ord("b") - ord("c"))
+
+    def test_symbolic_after_difference(self):
+        s1 = self.state.symbolicate_buffer("ab+\0")
+        s2 = self.state.symbolicate_buffer("ac+\0")
+        strs = self._push2(s1, s2)
+
+        ret = strcmp(self.state, *strs)
+        self.assertTrue(self.state.must_be_true(ret < 0))
+
+        s1 = self.state.symbolicate_buffer("+b\0")
+        s2 = "aa\0"
+        strs = self._push2(s1, s2)
+
+        ret = strcmp(self.state, *strs)
+        self.assertTrue(self.state.can_be_true(ret < 0))
+        self.state.constrain(s1[0] == ord("a"))
+        self.assertTrue(self.state.must_be_true(ret > 0))
+
+        # Difference within the concrete heads of long strings
+        s1 = self.state.symbolicate_buffer("x" * 50 + "a+\0")
+        s2 = self.state.symbolicate_buffer("x" * 50 + "b+\0")
+        strs = self._push2(s1, s2)
+        self.assertEqual(strcmp(self.state, *strs), ord("a") - ord("b"))
+
+        s2 = self.state.symbolicate_buffer("x" * 50 + "a+\0")
+        strs = self._push2(s1, s2)
+        ret = strcmp(self.state, *strs)
+        self.assertTrue(self.state.can_be_true(ret == 0))
+        self.state.constrain(s1[51] == ord("c"))
+        self.state.constrain(s2[51] == ord("d"))
+        self.assertTrue(self.state.must_be_true(ret < 0))
+
+    def test_symbolic_long(self):
+        s1 = self.state.symbolicate_buffer("+" * 10 + "\0")
+        s2 = "a" * 10 + "\0"
+        strs = self._push2(s1, s2)
+
+        ret = strcmp(self.state, *strs)
+        for i in range(3):
+            self.state.constrain(s1[i] == ord("a"))
+        self.state.constrain(s1[3] == ord("b"))
+        self.state.constrain(s1[5] == ord("+"))
+        self.assertTrue(self.state.must_be_true(ret > 0))
+        self._clear_constraints()
+
+        self.state.constrain(s1[8] == ord("b"))
+        self.assertTrue(self.state.can_be_true(ret < 0))
+        for i in range(8):
+            self.state.constrain(s1[i] == ord("a"))
+        self.assertTrue(self.state.must_be_true(ret > 0))
+        self.state.constrain(s1[9] == ord("a"))
+        self.assertTrue(self.state.must_be_true(ret > 0))
+        self._clear_constraints()
+
+        for i in range(10):
+            self.state.constrain(s1[i] == ord("a"))
+        self.assertTrue(self.state.must_be_true(ret == 0))
+
+    def test_symbolic_same_bytes(self):
+        sy = self.state.symbolicate_buffer("+++\0")
+        strs = self._push2(sy, sy)
+
+        solver = Z3Solver.instance()
+        with mock.patch.object(
+            solver, "can_be_true_many", wraps=solver.can_be_true_many
+        ) as can_be_true_many:
+            ret = strcmp(self.state, *strs)
+            # The second string's bytes are answered from the first one's queries
+            self.assertEqual(can_be_true_many.call_count, 1)
+        self.assertTrue(self.state.must_be_true(ret == 0))
+
+    def test_symbolic_past_null(self):
+        s1 = "ab\0"
+        s2 = self.state.symbolicate_buffer("+" * 200 + "\0")
+        strs = self._push2(s1, s2)
+
+        solver = Z3Solver.instance()
+        with mock.patch.object(
+            solver, "can_be_true_many", wraps=solver.can_be_true_many
+        ) as can_be_true_many:
+            ret = strcmp(self.state, *strs)
+            # s2 is not scanned past the NULL of s1
+            self.assertEqual(can_be_true_many.call_count, 1)
+        self.assertTrue(self.state.can_be_true(ret == 0))
+        self.state.constrain(s2[0] == ord("a"))
+        self.state.constrain(s2[1] == ord("b"))
+        self.assertTrue(self.state.can_be_true(ret < 0))
+        self.state.constrain(s2[2] == 0)
+        self.assertTrue(self.state.must_be_true(ret == 0))
+
     def test_symbolic_actually_concrete(self):
         s1 = "ab\0"
         s2 = self.state.symbolicate_buffer("d+\0")
@@ -139,6 +237,14 @@ class StrlenTest(ModelTest):
         ret = strlen(self.state, s)
         self.assertEqual(ret, 0)
 
+    def test_concrete_no_read(self):
+        s = self._push_string("a" * 100 + "\0")
+        memory = self.state.cpu.memory
+        with mock.patch.object(memory, "read", wraps=memory.read) as read:
+            self.assertEqual(strlen(self.state, s), 100)
+            read.assert_not_called()
+        self.assertNotIn(s, getattr(self.state, "_strzero_cache", {}))
+
     def test_symbolic_effective_null(self):
         sy = self.state.symbolicate_buffer("ab+")
         self.state.constrain(sy[2] == 0)
@@ -146,6 +252,20 @@ class StrlenTest(ModelTest):
         ret = strlen(self.state, s)
         self.assertEqual(ret, 2)
 
+    def test_symbolic_cannot_be_null(self):
+        sy = self.state.symbolicate_buffer("+++\0")
+        s = self._push_string(sy)
+        self.state.constrain(sy[0] != 0)
+        self.state.constrain(sy[2] != 0)
+
+        ret = strlen(self.state, s)
+        self.assertItemsEqual(
+            [1, 3], Z3Solver.instance().get_all_values(self.state.constraints, ret)
+        )
+
+        self.state.constrain(sy[1] != 0)
+        self.assertEqual(strlen(self.state, s), 3)
+
     def test_symbolic(self):
         sy = self.state.symbolicate_buffer("+++\0")
         s = self._push_string(sy)
@@ -198,3 +318,73 @@ class StrlenTest(ModelTest):
         self.state.constrain(sy[3] != 0)
         ret = strlen(self.state, s)
         self.assertTrue(self.state.must_be_true(ret == 4))
+
+    def test_read_events(self):
+        class Recorder:
+            def __init__(self):
+                self.reads = []
+
+            def did_read_memory(self, where, value, size):
+                self.reads.append((where, len(value), size))
+
+        recorder = Recorder()
+        self.state.cpu.subscribe("did_read_memory", recorder.did_read_memory)
+        sy = self.state.symbolicate_buffer("+++\0")
+        s = self._push_string(sy)
+        self.assertTrue(self.state.can_be_true(strlen(self.state, s) == 3))
+        # Whole strings are read at once, with one event each
+        self.assertIn((s, 4, 32), recorder.reads)
+        del recorder
+
+    def test_cached(self):
+        sy = self.state.symbolicate_buffer("++++")
+        s = self._push_string(sy)
+        self.state.constrain(sy[2] == 0)
+        self.assertTrue(self.state.must_be_true(strlen(self.state, s) <= 2))
+
+        # Same constraints and memory: no new solver queries, and a single read
+        memory = self.state.cpu.memory
+        with mock.patch.object(Z3Solver, "can_be_true_many") as can_be_true_many:
+            with mock.patch.object(memory, "read", wraps=memory.read) as read:
+                ret = strlen(self.state, s)
+                read.assert_called_once()
+            can_be_true_many.assert_not_called()
+        self.assertTrue(self.state.must_be_true(ret <= 2))
+        # The very same expression is handed out again
+        self.assertIs(strlen(self.state, s), ret)
+
+        # Overwritten memory
+        self.state.cpu.write_bytes(s, "ab\0")
+        self.assertEqual(strlen(self.state, s), 2)
+        self.state.cpu.write_bytes(s, "a\0")
+        self.assertEqual(strlen(self.state, s), 1)
+
+        # New constraints
+        self.state.cpu.write_bytes(s, sy)
+        self.assertTrue(self.state.can_be_true(strlen(self.state, s) == 0))
+        self.state.constrain(sy[0] != 0)
+        self.state.constrain(sy[1] == 0)
+        self.assertTrue(self.state.must_be_true(strlen(self.state, s) == 1))
+
+    def test_symbolic_over_zeros(self):
+        # Concrete zeros left under symbolic bytes must not be taken for NULLs
+        s = self._push_string("\0" * 4)
+        sy = self.state.symbolicate_buffer("a++\0")
+        self.state.cpu.write_bytes(s, sy)
+        self.state.constrain(sy[1] != 0)
+
+        ret = strlen(self.state, s)
+        self.assertItemsEqual(
+            [2, 3], Z3Solver.instance().get_all_values(self.state.constraints, ret)
+        )
+
+    def test_symbolic_long(self):
+        # Longer than a single window of _find_zeros
+        sy = self.state.symbolicate_buffer("+" * 40)
+        s = self._push_string(sy)
+
+        self.state.constrain(sy[33] == 0)
+        ret = strlen(self.state, s)
+        self.assertItemsEqual(
+            range(34), Z3Solver.instance().get_all_values(self.state.constraints, ret)
+        )
@@ -1,4 +1,5 @@
 import unittest
+from unittest import mock
 
 from manticore.core.smtlib import (
     ConstraintSet,
@@ -107,6 +108,88 @@ class ExpressionTest(unittest.TestCase):
         cs.add(a + b > 100)
         self.assertTrue(self.solver.check(cs))
 
+    def testSolverCanBeTrueMany(self):
+        cs = ConstraintSet()
+        a = cs.new_bitvec(8)
+        b = cs.new_bitvec(8)
+        cs.add(a == 0)
+        cs.add(b != a)
+        self.assertEqual(
+            self.solver.can_be_true_many(cs, [b != 0, a != 0, b == 1]), [True, False, True]
+        )
+        self.assertEqual(self.solver.can_be_true_many(cs, [a == 0, b == 0]), [True, False])
+        cs.add(a == 1)
+        self.assertEqual(self.solver.can_be_true_many(cs, [b != 0, a == 1]), [False, False])
+
+    def testSolverCanBeTrueManyReusesSession(self):
+        cs = ConstraintSet()
+        a = cs.new_bitvec(8)
+        cs.add(a == 0)
+        self.assertEqual(self.solver.can_be_true_many(cs, [a == 0]), [True])
+
+        with mock.patch.object(self.solver, "_reset", wraps=self.solver._reset) as reset:
+            # Variables that are not in the constraints yet are declared on the fly
+            b = cs.new_bitvec(8)
+            self.assertEqual(self.solver.can_be_true_many(cs, [b == a, a == 1]), [True, False])
+            self.assertEqual(self.solver.can_be_true_many(cs, [b != 0]), [True])
+            reset.assert_not_called()
+
+            cs.add(b == 0)
+            self.assertEqual(self.solver.can_be_true_many(cs, [b != 0]), [False])
+            reset.assert_called_once()
+
+    def testSolverCanBeTrueManyUsesModels(self):
+        cs = ConstraintSet()
+        bvs = [cs.new_bitvec(8) for _ in range(4)]
+        cs.add(bvs[3] != 0)
+        expressions = []
+        for bv in bvs:
+            expressions += [bv == 0, bv != 0]
+
+        with mock.patch.object(self.solver, "_is_sat", wraps=self.solver._is_sat) as is_sat:
+            self.assertEqual(
+                self.solver.can_be_true_many(cs, expressions), [True] * 6 + [False, True]
+            )
+            # Models settle some of the expressions that are not checked on their own
+            self.assertLess(is_sat.call_count, len(expressions))
+
+    def testSolverCanBeTrueManyAllInfeasible(self):
+        cs = ConstraintSet()
+        bvs = [cs.new_bitvec(8) for _ in range(16)]
+        for bv in bvs:
+            cs.add(bv != 0)
+
+        with mock.patch.object(self.solver, "_is_sat", wraps=self.solver._is_sat) as is_sat:
+            self.assertEqual(
+                self.solver.can_be_true_many(cs, [bv == 0 for bv in bvs]), [False] * 16
+            )
+            # Each core holds a single literal, which needs no check on its own
+            self.assertEqual(is_sat.call_count, 16)
+
+    def testSolverResetTakesSpare(self):
+        from manticore import config
+
+        consts = config.get_group("smt")
+        # No spares unless asked for
+        self.solver._reset()
+        self.assertIsNone(self.solver._spawner)
+
+        consts.spare_procs = 1
+        try:
+            self.solver._reset()
+            self.solver._spawner.join()
+            spare = self.solver._spares[0]
+            self.solver._reset()
+            self.assertIs(self.solver._proc, spare)
+        finally:
+            consts.spare_procs = 0
+
+        cs = ConstraintSet()
+        a = cs.new_bitvec(8)
+        cs.add(a == 1)
+        self.assertTrue(self.solver.check(cs))
+        self.assertFalse(self.solver.can_be_true(cs, a == 0))
+
     def testBool1(self):
         cs = ConstraintSet()
         bf = BoolConstant(False)